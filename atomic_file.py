@@ -0,0 +1,18 @@
+import contextlib
+import os
+import tempfile
+
+
+@contextlib.contextmanager
+def atomic_write(path):
+    # Ghi ra file tạm cùng thư mục rồi đổi tên: không ai đọc phải file ghi dở.
+    # mkstemp cho mỗi lần ghi một tên riêng, nên hai luồng (hay hai process) ghi cùng một file không giẫm lên nhau
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,98 @@
+import csv
+import io
+import tempfile
+
+from pymongo import ASCENDING
+
+# Đọc từ MongoDB theo từng lô để bộ nhớ không tăng theo số bản ghi
+EXPORT_BATCH_SIZE = 1000
+# Giới hạn số dòng của một sheet Excel (kể cả dòng tiêu đề); vượt quá thì sang sheet mới
+MAX_SHEET_ROWS = 1048576
+RECORD_COLUMNS = [
+    ('student_id', 'Mã sinh viên'),
+    ('name', 'Tên sinh viên'),
+    ('date', 'Ngày điểm danh'),
+    ('time', 'Thời gian điểm danh'),
+    ('room', 'Phòng'),
+    ('camera_id', 'Camera'),
+]
+TOTAL_COLUMNS = [
+    ('student_id', 'Mã sinh viên'),
+    ('name', 'Tên sinh viên'),
+    ('days', 'Số ngày có mặt'),
+    ('first_date', 'Ngày đầu tiên'),
+    ('last_date', 'Ngày gần nhất'),
+]
+
+
+def iter_records(attendance_collection, query):
+    projection = {'_id': 0, 'student_id': 1, 'name': 1, 'date': 1, 'timestamp': 1, 'room': 1, 'camera_id': 1}
+    cursor = (attendance_collection.find(query, projection)
+              .sort([('timestamp', ASCENDING), ('_id', ASCENDING)])
+              .batch_size(EXPORT_BATCH_SIZE))
+    for record in cursor:
+        record['time'] = record['timestamp'].strftime('%H:%M:%S') if record.get('timestamp') else ''
+        yield [record.get(key, '') or '' for key, _ in RECORD_COLUMNS]
+
+
+def iter_totals(attendance_collection, query):
+    # Tổng hợp theo sinh viên trên server, kết quả cũng được đọc theo lô
+    pipeline = [
+        {'$match': query},
+        # Sắp theo thời gian để $last lấy đúng tên trong bản ghi mới nhất
+        {'$sort': {'timestamp': 1, '_id': 1}},
+        {'$group': {
+            '_id': '$student_id',
+            'name': {'$last': '$name'},
+            'dates': {'$addToSet': '$date'},
+            'first_date': {'$min': '$date'},
+            'last_date': {'$max': '$date'},
+        }},
+        {'$project': {'_id': 0, 'student_id': '$_id', 'name': 1, 'days': {'$size': '$dates'},
+                      'first_date': 1, 'last_date': 1}},
+        {'$sort': {'student_id': 1}},
+    ]
+    for total in attendance_collection.aggregate(pipeline, allowDiskUse=True, batchSize=EXPORT_BATCH_SIZE):
+        yield [total.get(key, '') for key, _ in TOTAL_COLUMNS]
+
+
+def stream_csv(columns, rows):
+    # Ghi CSV từng dòng một qua generator; BOM để Excel đọc đúng tiếng Việt
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    yield '\ufeff'
+    writer.writerow([title for _, title in columns])
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() > 65536:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_xlsx(columns, rows, chunk_size=65536, max_sheet_rows=MAX_SHEET_ROWS):
+    # openpyxl ở chế độ write_only ghi từng dòng ra file tạm nên bộ nhớ không đổi,
+    # sau đó file được gửi dần cho client
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    header = [title for _, title in columns]
+    sheet_rows = max_sheet_rows
+    for row in rows:
+        if sheet_rows >= max_sheet_rows:
+            # Sheet đầy (hoặc chưa có sheet nào): tạo sheet mới 'Điểm danh', 'Điểm danh (2)', ... có dòng tiêu đề
+            count = len(workbook.worksheets)
+            sheet = workbook.create_sheet('Điểm danh' if count == 0 else f'Điểm danh ({count + 1})')
+            sheet.append(header)
+            sheet_rows = 1
+        sheet.append(row)
+        sheet_rows += 1
+    if not workbook.worksheets:
+        workbook.create_sheet('Điểm danh').append(header)
+
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            yield chunk
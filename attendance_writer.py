@@ -0,0 +1,138 @@
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure, PyMongoError
+
+from metrics import ATTENDANCE_WRITE_ERRORS, ATTENDANCE_WRITTEN, MONGO_SECONDS
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class AttendanceWriter:
+    # Ghi điểm danh kiểu write-behind: luồng video chỉ đưa bản ghi vào hàng đợi,
+    # luồng nền gom lại và ghi một lần bằng bulk_write (upsert theo student_id + date)
+    def __init__(self, collection, batch_size=100, flush_interval=1.0):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._pending = []
+        # Ngày điểm danh gần nhất của mỗi sinh viên, tránh ghi lại trong cùng một ngày
+        self.last_attendance = {}
+        self._last_attendance_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        # Ghi nốt các bản ghi còn trong hàng đợi khi process thoát
+        atexit.register(self.close)
+
+    def ensure_indexes(self):
+        # Index unique giúp upsert không bao giờ tạo bản ghi trùng trong cùng một ngày
+        try:
+            self.collection.create_index([('student_id', ASCENDING), ('date', ASCENDING)], unique=True)
+        except OperationFailure as e:
+            print(f"Không tạo được index unique (student_id, date), có thể do dữ liệu cũ bị trùng: {str(e)}")
+
+    def seed_last_attendance(self, date):
+        # Khởi tạo bộ nhớ đệm từ các sinh viên đã điểm danh trong ngày khi khởi động
+        with self._last_attendance_lock:
+            for record in self.collection.find({'date': date}, {'student_id': 1, '_id': 0}):
+                self.last_attendance[record['student_id']] = date
+        return self.last_attendance
+
+    def mark_present(self, student_id, name, camera, now=None):
+        # Đưa bản ghi điểm danh vào hàng đợi nếu hôm nay sinh viên chưa được ghi nhận
+        now = now or datetime.now()
+        today = now.strftime("%Y-%m-%d")
+        with self._last_attendance_lock:
+            if self.last_attendance.get(student_id) == today:
+                return None
+            self.last_attendance[student_id] = today
+
+        # Upsert theo student_id + date nên không cần đọc database trước
+        record = {
+            'student_id': student_id,
+            'name': name,
+            'timestamp': now,
+            'date': today,
+            'camera_id': camera['id'],
+            'room': camera['room']
+        }
+        self.log(record)
+        return record
+
+    def log(self, record):
+        self._queue.put(record)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._collect(time.monotonic() + self.flush_interval)
+                if self._pending and not self._flush():
+                    # MongoDB lỗi: chờ một nhịp rồi thử lại, không quay vòng liên tục
+                    self._stop.wait(self.flush_interval)
+            except Exception as e:
+                # Lỗi không phải của MongoDB (vd. bản ghi không mã hóa được BSON) sẽ lặp lại mãi nếu thử lại:
+                # ghi log các bản ghi của batch lỗi rồi bỏ batch đó, luồng ghi vẫn chạy tiếp
+                ATTENDANCE_WRITE_ERRORS.inc()
+                student_ids = [record.get('student_id') for record in self._pending]
+                print(f"Lỗi ghi điểm danh, bỏ {len(student_ids)} bản ghi {student_ids}: {e!r}")
+                # Bỏ đánh dấu đã điểm danh để lần nhận diện sau trong ngày vẫn ghi lại được
+                with self._last_attendance_lock:
+                    for record in self._pending:
+                        if self.last_attendance.get(record.get('student_id')) == record.get('date'):
+                            del self.last_attendance[record['student_id']]
+                self._pending = []
+                self._stop.wait(self.flush_interval)
+
+    def _collect(self, deadline):
+        # Lấy bản ghi cho tới khi đủ batch_size hoặc hết flush_interval
+        while len(self._pending) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                return
+            try:
+                self._pending.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                return
+
+    def _flush(self):
+        operations = [
+            UpdateOne({'student_id': record['student_id'], 'date': record['date']},
+                      {'$setOnInsert': record}, upsert=True)
+            for record in self._pending
+        ]
+        try:
+            with MONGO_SECONDS.time(operation='attendance_bulk_write'):
+                self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Hai upsert cùng lúc có thể va chạm index unique: bản ghi đã có, bỏ qua
+            errors = [error for error in e.details.get('writeErrors', [])
+                      if error.get('code') != DUPLICATE_KEY_ERROR]
+            if errors:
+                print(f"Lỗi ghi điểm danh: {errors}")
+        except PyMongoError as e:
+            # Giữ lại các bản ghi để thử lại ở lần flush sau
+            print(f"Lỗi ghi điểm danh, sẽ thử lại: {str(e)}")
+            return False
+        ATTENDANCE_WRITTEN.inc(len(self._pending))
+        self._pending = []
+        return True
+
+    def close(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        # Lấy hết các bản ghi còn lại trong hàng đợi và ghi lần cuối
+        while True:
+            try:
+                self._pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if self._pending and not self._flush():
+            print(f"Không ghi được {len(self._pending)} bản ghi điểm danh khi thoát")
@@ -0,0 +1,109 @@
+# So sánh index gần đúng với index chính xác trên gallery 128 chiều giả lập
+# Chạy: python -m benchmarks.bench_index --sizes 10000 100000 --n-probe 1 4 8 16 --gallery isotropic clustered
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import face_index
+
+
+# Nhiễu của truy vấn theo kiểu gallery. Với 'isotropic', khoảng cách giữa hai người khác nhau ~0.95
+# và giữa hai ảnh của cùng một người ~0.4, gần với encoding thật của face_recognition (ngưỡng 0.6)
+QUERY_NOISE = {'isotropic': 0.035, 'clustered': 0.02}
+
+
+def make_gallery(size, kind='isotropic', n_identities_per_cluster=50, seed=0):
+    # 'isotropic': phân bố Gauss đều mọi hướng, không có cụm nào để IVF tận dụng (trường hợp khó, mặc định).
+    # 'clustered': encoding thật tụ thành nhiều cụm, giả lập bằng hỗn hợp Gauss
+    # (trường hợp dễ: recall gần như luôn bằng 1 với mọi n_probe)
+    rng = np.random.default_rng(seed)
+    if kind == 'isotropic':
+        return rng.normal(0.0, 0.06, size=(size, face_index.ENCODING_SIZE)).astype(np.float32)
+    n_clusters = max(1, size // n_identities_per_cluster)
+    centers = rng.normal(0.0, 0.12, size=(n_clusters, face_index.ENCODING_SIZE))
+    labels = rng.integers(0, n_clusters, size=size)
+    gallery = centers[labels] + rng.normal(0.0, 0.04, size=(size, face_index.ENCODING_SIZE))
+    return gallery.astype(np.float32)
+
+
+def make_queries(gallery, n_queries, noise=0.02, seed=1):
+    # Truy vấn là ảnh khác của cùng một người: encoding trong gallery cộng nhiễu nhỏ
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(gallery), size=n_queries)
+    return gallery[rows] + rng.normal(0.0, noise, size=(n_queries, gallery.shape[1])).astype(np.float32)
+
+
+def run_queries(index, queries, batch_size):
+    start = time.perf_counter()
+    results = []
+    for i in range(0, len(queries), batch_size):
+        _, indices = index.search(queries[i:i + batch_size], k=1)
+        results.append(indices[:, 0])
+    elapsed = time.perf_counter() - start
+    return np.concatenate(results), len(queries) / elapsed
+
+
+def benchmark(size, n_probes, n_lists, n_queries, batch_size, gallery_kind='isotropic'):
+    gallery = make_gallery(size, gallery_kind)
+    queries = make_queries(gallery, n_queries, noise=QUERY_NOISE[gallery_kind])
+
+    exact = face_index.create_index('brute', gallery)
+    truth, exact_qps = run_queries(exact, queries, batch_size)
+    rows = [{'size': size, 'gallery': gallery_kind, 'index': 'brute', 'recall@1': 1.0, 'qps': round(exact_qps, 1)}]
+
+    start = time.perf_counter()
+    ivf = face_index.create_index('ivf', gallery, n_lists=n_lists or None)
+    build_seconds = time.perf_counter() - start
+
+    # Kiểm tra lưu/nạp index trên đĩa
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'index.npz')
+        ivf.save(path)
+        start = time.perf_counter()
+        ivf = face_index.load_index(path)
+        load_seconds = time.perf_counter() - start
+
+    for n_probe in n_probes:
+        ivf.n_probe = n_probe
+        found, qps = run_queries(ivf, queries, batch_size)
+        rows.append({
+            'size': size,
+            'gallery': gallery_kind,
+            'index': 'ivf',
+            'n_lists': len(ivf.centroids),
+            'n_probe': n_probe,
+            'recall@1': round(float(np.mean(found == truth)), 4),
+            'qps': round(qps, 1),
+            'speedup': round(qps / exact_qps, 2),
+            'build_s': round(build_seconds, 2),
+            'load_s': round(load_seconds, 2),
+        })
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark recall@1 và queries/giây của các index khuôn mặt')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--n-probe', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--n-lists', type=int, default=0, help='0 = tự chọn ~sqrt(N)')
+    parser.add_argument('--gallery', choices=['isotropic', 'clustered'], nargs='+', default=['isotropic'],
+                        help='Kiểu gallery giả lập: isotropic (khó) và/hoặc clustered (dễ)')
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=4, help='Số khuôn mặt trong một frame')
+    parser.add_argument('--json', action='store_true', help='In kết quả dạng JSON')
+    args = parser.parse_args()
+
+    results = []
+    for gallery_kind in args.gallery:
+        for size in args.sizes:
+            results.extend(benchmark(size, args.n_probe, args.n_lists, args.queries, args.batch_size, gallery_kind))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for row in results:
+            print('  '.join(f'{key}={value}' for key, value in row.items()))
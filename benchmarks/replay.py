@@ -0,0 +1,319 @@
+# Phát lại video hoặc thư mục ảnh qua đúng đường đi nhận diện của ứng dụng
+# (đọc frame -> RGB -> phát hiện -> theo dõi (FaceTracker) -> encoding -> so khớp -> ghi điểm danh)
+# mà không cần webcam hay MongoDB thật. Thời điểm của frame lấy theo fps của video (hoặc --fps với thư mục ảnh)
+# nên khuôn mặt đã nhận ra chỉ được encode lại sau --track-confirm-seconds giây như khi chạy thật.
+#
+# Chạy: python -m benchmarks.replay video.mp4 --enroll-dir anh_sinh_vien --gallery-size 1000 10000 --json ket_qua.json
+# So sánh cấu hình phát hiện: --detect-width 0 640 320 --detect-model hog cnn --upsample 1 0
+# Lọc chất lượng trước khi encode: --quality-gate (báo cáo số khuôn mặt bỏ qua và thời gian encode tiết kiệm được)
+# (cấu hình đầu tiên của lưới là mốc để tính độ chính xác của các cấu hình còn lại)
+# Mặc định dùng MongoDB trong bộ nhớ (cần cài mongomock), hoặc --mongodb-uri để dùng MongoDB thật.
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+import face_store
+import recognition
+from face_quality import QualityGate
+from attendance_writer import AttendanceWriter
+from benchmarks.bench_index import make_gallery
+from matcher import FaceMatcher
+from tracker import FaceTracker
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+REPLAY_CAMERA = {'id': 'replay', 'room': 'replay'}
+
+
+def connect_database(mongodb_uri, database):
+    if mongodb_uri == 'memory':
+        try:
+            import mongomock
+        except ImportError:
+            raise SystemExit("Cần cài mongomock để dùng MongoDB trong bộ nhớ: pip install mongomock")
+        client = mongomock.MongoClient()
+    else:
+        from database import create_client
+        client = create_client(mongodb_uri)
+    return client[database]
+
+
+def iter_frames(source, max_frames=None):
+    # Nguồn là thư mục ảnh (đọc theo thứ tự tên file) hoặc file video
+    count = 0
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if max_frames and count >= max_frames:
+                return
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                frame = cv2.imread(os.path.join(source, name))
+                if frame is not None:
+                    count += 1
+                    yield frame
+        return
+
+    capture = cv2.VideoCapture(source)
+    try:
+        while not max_frames or count < max_frames:
+            success, frame = capture.read()
+            if not success:
+                return
+            count += 1
+            yield frame
+    finally:
+        capture.release()
+
+
+def source_fps(source, default):
+    # fps của file video; thư mục ảnh hoặc video không ghi fps thì dùng giá trị mặc định
+    if os.path.isdir(source):
+        return default
+    capture = cv2.VideoCapture(source)
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS)
+    finally:
+        capture.release()
+    return fps if fps and fps > 0 else default
+
+
+def enroll(students_collection, enroll_dir, gallery_size):
+    # Ảnh trong enroll_dir là sinh viên thật (mã sinh viên = tên file),
+    # phần còn lại của gallery được bù bằng encoding giả lập
+    students_collection.delete_many({})
+    students = []
+    if enroll_dir:
+        for name in sorted(os.listdir(enroll_dir)):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            student_id = os.path.splitext(name)[0]
+            student = {'student_id': student_id, 'name': student_id, 'image_path': name}
+            student.update(face_store.build_encoding_fields(enroll_dir, name))
+            students.append(student)
+
+    padding = max(gallery_size - len(students), 0)
+    for i, encoding in enumerate(make_gallery(padding) if padding else []):
+        students.append({
+            'student_id': f'synthetic_{i}',
+            'name': f'synthetic_{i}',
+            'image_path': f'synthetic_{i}.jpg',
+            face_store.ENCODING_FIELD: encoding.astype(float).tolist(),
+            face_store.ENCODING_PATH_FIELD: f'synthetic_{i}.jpg',
+        })
+    if students:
+        students_collection.insert_many(students)
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    values = np.asarray(values) * 1000.0
+    return {
+        'count': len(values),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'max_ms': round(float(values.max()), 3),
+    }
+
+
+def max_rss_mb():
+    # ru_maxrss tính bằng KB trên Linux, byte trên macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if platform.system() == 'Darwin' else 1024), 1)
+
+
+def replay(args, db, gallery_size, detection):
+    enroll(db['students'], args.enroll_dir, gallery_size)
+    db['attendance'].delete_many({})
+
+    start = time.perf_counter()
+    index_params = {'n_probe': args.n_probe} if args.index == 'ivf' else {}
+    matcher = FaceMatcher(face_store.load_encodings(db['students']), tolerance=args.tolerance,
+                          index_type=args.index, **index_params)
+    gallery_load_seconds = time.perf_counter() - start
+
+    writer = AttendanceWriter(db['attendance'])
+    tracker = FaceTracker(args.track_iou, args.track_max_age, args.track_confirm_seconds)
+    track_students = {}  # track id -> mã sinh viên đã nhận ra
+    fps = source_fps(args.source, args.fps)
+    stages = {name: [] for name in
+              ('read', 'to_rgb', 'detect', 'track', 'quality', 'encode', 'match', 'log', 'total')}
+    frames = faces = recognized = encoded = tracked = 0
+    skipped = {}  # Số khuôn mặt bỏ qua encoding theo lý do (khi bật --quality-gate)
+    gate = QualityGate() if args.quality_gate else None
+    frame_ids = []  # Các sinh viên nhận diện được ở từng frame, để so sánh giữa các cấu hình
+
+    start = time.perf_counter()
+    frame_start = time.perf_counter()
+    for frame_index, frame in enumerate(iter_frames(args.source, args.max_frames)):
+        t0 = time.perf_counter()
+        stages['read'].append(t0 - frame_start)
+        captured_at = frame_index / fps
+
+        rgb_frame = recognition.to_rgb(frame)
+        t1 = time.perf_counter()
+        face_locations = recognition.detect(rgb_frame, detection['detect_width'],
+                                            detection['model'], detection['upsample'])
+        t2 = time.perf_counter()
+        # Như recognize_faces trong app.py: chỉ encode track mới hoặc track đã lâu chưa xác nhận lại
+        tracks = tracker.update(face_locations, captured_at)
+        pending = [(track, location) for track, location in zip(tracks, face_locations)
+                   if tracker.needs_encoding(track, captured_at)]
+        locations = [location for _, location in pending]
+        t3 = time.perf_counter()
+        if gate is None:
+            face_encodings = recognition.encode(rgb_frame, locations)
+            encode_seconds = time.perf_counter() - t3
+        else:
+            _, rejected, face_encodings, encode_seconds = recognition.analyze(
+                rgb_frame, locations, [True] * len(locations), gate, 'small')
+            for reason in rejected:
+                if reason is not None:
+                    skipped[reason] = skipped.get(reason, 0) + 1
+        encoded_faces = [(track, encoding) for (track, _), encoding in zip(pending, face_encodings)
+                         if encoding is not None]
+        encoded += len(encoded_faces)
+        t4 = time.perf_counter()
+        matches = matcher.match([encoding for _, encoding in encoded_faces])
+        t5 = time.perf_counter()
+        for (track, _), (known_face, distance) in zip(encoded_faces, matches):
+            if known_face is None:
+                tracker.confirm(track, "Unknown", False, captured_at)
+                track_students.pop(track.id, None)
+                continue
+            recognized += 1
+            tracker.confirm(track, f"{known_face['name']} ({known_face['student_id']})", True, captured_at)
+            track_students[track.id] = known_face['student_id']
+            writer.mark_present(known_face['student_id'], known_face['name'], REPLAY_CAMERA)
+        t6 = time.perf_counter()
+
+        stages['to_rgb'].append(t1 - t0)
+        stages['detect'].append(t2 - t1)
+        stages['track'].append(t3 - t2)
+        stages['quality'].append(t4 - t3 - encode_seconds)
+        stages['encode'].append(encode_seconds)
+        stages['match'].append(t5 - t4)
+        stages['log'].append(t6 - t5)
+        stages['total'].append(t6 - frame_start)
+        frames += 1
+        faces += len(face_locations)
+        tracked += len(face_locations) - len(pending)
+        # Sinh viên có mặt trong frame: gồm cả các track đã nhận ra từ trước, không phải encode lại
+        frame_ids.append({track_students[track.id] for track in tracks if track.id in track_students})
+        frame_start = time.perf_counter()
+    elapsed = time.perf_counter() - start
+
+    # Ghi nốt các bản ghi điểm danh để tính cả thời gian flush
+    flush_start = time.perf_counter()
+    writer.close()
+    flush_seconds = time.perf_counter() - flush_start
+
+    return frame_ids, {
+        'gallery_size': len(matcher),
+        'index': args.index,
+        'detection': detection,
+        'frames': frames,
+        'faces': faces,
+        'encoded': encoded,
+        'tracked': tracked,  # Số khuôn mặt không phải encode vì thuộc track đã nhận ra
+        'skipped': skipped,
+        # Ước tính thời gian encoding tiết kiệm được = số khuôn mặt bỏ qua x thời gian encode trung bình mỗi khuôn mặt
+        'encode_saved_s': round(sum(skipped.values()) * sum(stages['encode']) / encoded, 3) if encoded else None,
+        'recognized': recognized,
+        'attendance_records': db['attendance'].count_documents({}),
+        'elapsed_s': round(elapsed, 3),
+        'fps': round(frames / elapsed, 2) if elapsed else 0.0,
+        'matches_per_s': round(encoded / sum(stages['match']), 1) if sum(stages['match']) else None,
+        'gallery_load_s': round(gallery_load_seconds, 3),
+        'attendance_flush_s': round(flush_seconds, 3),
+        'index_mb': round(matcher.index.vectors.nbytes / (1024 * 1024), 2),
+        'max_rss_mb': max_rss_mb(),
+        'stages': {name: percentiles(values) for name, values in stages.items()},
+    }
+
+
+def compare_with_baseline(result, frame_ids, baseline):
+    # Độ chính xác so với cấu hình mốc: tỉ lệ khuôn mặt phát hiện được
+    # và tỉ lệ sinh viên mốc nhận diện được ở cùng frame vẫn được nhận diện
+    baseline_result, baseline_ids = baseline
+    expected = sum(len(ids) for ids in baseline_ids)
+    found = sum(len(ids & base) for ids, base in zip(frame_ids, baseline_ids))
+    result['faces_vs_baseline'] = round(result['faces'] / baseline_result['faces'], 4) if baseline_result['faces'] else None
+    result['recall_vs_baseline'] = round(found / expected, 4) if expected else None
+    result['speedup_vs_baseline'] = round(result['fps'] / baseline_result['fps'], 2) if baseline_result['fps'] else None
+
+
+def print_result(result):
+    detection = result['detection']
+    print(f"detect_width={detection['detect_width']} model={detection['model']} upsample={detection['upsample']} "
+          f"faces_vs_baseline={result.get('faces_vs_baseline')} recall_vs_baseline={result.get('recall_vs_baseline')} "
+          f"speedup_vs_baseline={result.get('speedup_vs_baseline')}")
+    print(f"gallery={result['gallery_size']} index={result['index']} frames={result['frames']} "
+          f"faces={result['faces']} encoded={result['encoded']} tracked={result['tracked']} "
+          f"skipped={result['skipped']} encode_saved={result['encode_saved_s']}s recognized={result['recognized']} fps={result['fps']} "
+          f"matches/s={result['matches_per_s']} index={result['index_mb']}MB rss={result['max_rss_mb']}MB")
+    for name, stats in result['stages'].items():
+        if stats:
+            print(f"  {name:<7} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark đường đi nhận diện bằng video/thư mục ảnh')
+    parser.add_argument('source', help='File video hoặc thư mục ảnh')
+    parser.add_argument('--enroll-dir', help='Thư mục ảnh sinh viên (mã sinh viên = tên file)')
+    parser.add_argument('--gallery-size', type=int, nargs='+', default=[0],
+                        help='Bù gallery bằng encoding giả lập tới các kích thước này')
+    parser.add_argument('--index', default='brute', choices=['brute', 'ivf'])
+    parser.add_argument('--n-probe', type=int, default=4)
+    parser.add_argument('--tolerance', type=float, default=0.6)
+    parser.add_argument('--detect-width', type=int, nargs='+', default=[0],
+                        help='Chiều ngang ảnh khi phát hiện khuôn mặt (0 = độ phân giải gốc)')
+    parser.add_argument('--detect-model', nargs='+', default=['hog'], choices=['hog', 'cnn'])
+    parser.add_argument('--upsample', type=int, nargs='+', default=[1])
+    parser.add_argument('--quality-gate', action='store_true',
+                        help='Bỏ qua encoding cho khuôn mặt nhỏ/mờ/tối/quay ngang (ngưỡng mặc định của QualityGate)')
+    parser.add_argument('--fps', type=float, default=30.0,
+                        help='Số frame/giây để tính thời điểm frame khi nguồn là thư mục ảnh')
+    parser.add_argument('--track-iou', type=float, default=0.3)
+    parser.add_argument('--track-max-age', type=float, default=2.0)
+    parser.add_argument('--track-confirm-seconds', type=float, default=10.0,
+                        help='Thời gian trước khi encode lại khuôn mặt đã nhận ra (0 = encode ở mọi frame)')
+    parser.add_argument('--max-frames', type=int)
+    parser.add_argument('--mongodb-uri', default='memory', help="'memory' = MongoDB giả lập trong bộ nhớ")
+    parser.add_argument('--database', default='attendance_benchmark')
+    parser.add_argument('--json', help='Ghi kết quả ra file JSON để so sánh giữa các phiên bản')
+    args = parser.parse_args()
+
+    db = connect_database(args.mongodb_uri, args.database)
+    results = []
+    detections = [
+        {'detect_width': width, 'model': model, 'upsample': upsample}
+        for width, model, upsample in itertools.product(args.detect_width, args.detect_model, args.upsample)
+    ]
+    for gallery_size in args.gallery_size:
+        baseline = None
+        for detection in detections:
+            frame_ids, result = replay(args, db, gallery_size, detection)
+            if baseline is None:
+                baseline = (result, frame_ids)
+            compare_with_baseline(result, frame_ids, baseline)
+            print_result(result)
+            results.append(result)
+
+    if args.json:
+        report = {
+            'created_at': datetime.now().isoformat(),
+            'source': args.source,
+            'python': platform.python_version(),
+            'results': results,
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,138 @@
+# Đo thời gian khởi động ứng dụng cho các trang quản lý: import app.py và trả lời request
+# /students, /attendance đầu tiên, mỗi lần chạy trong một process Python mới.
+# Kiểm tra thêm rằng lúc đó chưa nạp face_recognition/dlib và chưa mở camera.
+#
+# Chạy: python -m benchmarks.startup --runs 5 --max-seconds 1.0 --json ket_qua.json
+# Mặc định dùng MongoDB trong bộ nhớ (cần cài mongomock), hoặc --mongodb-uri để dùng MongoDB thật.
+# --imports in ra các module import chậm nhất (theo python -X importtime).
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+from benchmarks.replay import percentiles
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['face_recognition', 'dlib', 'face_recognition_models']
+
+# Chạy trong process con: mọi thời gian tính từ lúc interpreter bắt đầu chạy script
+CHILD_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+mongodb_uri = sys.argv[1]
+if mongodb_uri == 'memory':
+    import mongomock, pymongo
+    pymongo.MongoClient = mongomock.MongoClient
+import cv2
+opened = []
+_VideoCapture = cv2.VideoCapture
+def VideoCapture(*args, **kwargs):
+    opened.append(args[0] if args else None)
+    return _VideoCapture(*args, **kwargs)
+cv2.VideoCapture = VideoCapture
+
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+statuses = {}
+for url in ['/students', '/attendance']:
+    statuses[url] = client.get(url).status_code
+served = time.perf_counter()
+print(json.dumps({
+    'import_seconds': imported - start,
+    'first_requests_seconds': served - imported,
+    'total_seconds': served - start,
+    'statuses': statuses,
+    'heavy_modules': [name for name in sys.argv[2:] if name in sys.modules],
+    'cameras_opened': [str(source) for source in opened],
+}))
+'''
+
+
+def child_env(args):
+    env = dict(os.environ)
+    if args.mongodb_uri != 'memory':
+        env['MONGODB_URI'] = args.mongodb_uri
+    # Mô phỏng máy chủ không có camera
+    env.setdefault('CAMERAS', json.dumps([{'id': 'headless', 'source': '/dev/video-missing'}]))
+    return env
+
+
+def run_once(args):
+    command = [sys.executable, '-c', CHILD_SCRIPT, args.mongodb_uri] + HEAVY_MODULES
+    output = subprocess.run(command, cwd=ROOT, env=child_env(args), capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(args, limit=15):
+    # python -X importtime ghi ra stderr: "import time: self [us] | cumulative | module"
+    command = [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT, args.mongodb_uri]
+    output = subprocess.run(command, cwd=ROOT, env=child_env(args), capture_output=True, text=True, check=True)
+    imports = []
+    for line in output.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        imports.append((int(cumulative) / 1e6, module.rstrip()))
+    return sorted(imports, reverse=True)[:limit]
+
+
+def print_result(result):
+    print(f"Khởi động ({result['runs']} lần): import p50 {result['import']['p50_ms']:.0f}ms, "
+          f"request đầu tiên p50 {result['first_requests']['p50_ms']:.0f}ms, "
+          f"tổng p50 {result['total']['p50_ms']:.0f}ms, p95 {result['total']['p95_ms']:.0f}ms")
+    print(f"  Module nặng đã nạp: {', '.join(result['heavy_modules']) or 'không'}; "
+          f"camera đã mở: {', '.join(result['cameras_opened']) or 'không'}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark thời gian khởi động cho các trang quản lý')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=1.0,
+                        help='Thất bại (mã thoát 1) nếu p50 thời gian tổng vượt quá ngưỡng này')
+    parser.add_argument('--mongodb-uri', default='memory', help="'memory' = MongoDB giả lập trong bộ nhớ")
+    parser.add_argument('--imports', action='store_true', help='In các module import chậm nhất')
+    parser.add_argument('--json', help='Ghi kết quả ra file JSON để so sánh giữa các phiên bản')
+    args = parser.parse_args()
+
+    runs = [run_once(args) for _ in range(args.runs)]
+    result = {
+        'runs': args.runs,
+        'import': percentiles([run['import_seconds'] for run in runs]),
+        'first_requests': percentiles([run['first_requests_seconds'] for run in runs]),
+        'total': percentiles([run['total_seconds'] for run in runs]),
+        'statuses': runs[-1]['statuses'],
+        'heavy_modules': sorted({name for run in runs for name in run['heavy_modules']}),
+        'cameras_opened': sorted({source for run in runs for source in run['cameras_opened']}),
+    }
+    print_result(result)
+    if args.imports:
+        for seconds, module in slowest_imports(args):
+            print(f"  {seconds:8.3f}s  {module}")
+
+    if args.json:
+        report = {
+            'created_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'result': result,
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    failures = []
+    startup_seconds = result['total']['p50_ms'] / 1000.0
+    if startup_seconds > args.max_seconds:
+        failures.append(f"thời gian khởi động {startup_seconds:.3f}s > {args.max_seconds}s")
+    if result['heavy_modules']:
+        failures.append(f"đã nạp {', '.join(result['heavy_modules'])} khi chưa có ai xem video")
+    if result['cameras_opened']:
+        failures.append('đã mở camera khi chưa có ai xem video')
+    if any(status != 200 for status in result['statuses'].values()):
+        failures.append(f"request lỗi: {result['statuses']}")
+    for failure in failures:
+        print(f"Lỗi: {failure}")
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,79 @@
+import json
+import os
+import time
+
+import cv2
+
+# Mặc định: một webcam (thiết bị 0)
+DEFAULT_CAMERAS = [{'id': 'default', 'room': '', 'source': 0}]
+
+
+def load_cameras():
+    # Cấu hình camera dạng JSON: [{"id": "a101", "room": "A101", "source": 0}, ...]
+    # source là số thiết bị, đường dẫn file video hoặc URL (rtsp://, http://)
+    # Có thể thêm detect_width/detect_model/detect_upsample để chỉnh tốc độ/độ chính xác theo từng phòng
+    # Đọc từ biến môi trường CAMERAS hoặc file có đường dẫn trong CAMERAS_FILE
+    if os.environ.get('CAMERAS'):
+        cameras = json.loads(os.environ['CAMERAS'])
+    elif os.environ.get('CAMERAS_FILE'):
+        with open(os.environ['CAMERAS_FILE'], encoding='utf-8') as f:
+            cameras = json.load(f)
+    else:
+        cameras = DEFAULT_CAMERAS
+
+    for camera in cameras:
+        if 'id' not in camera or 'source' not in camera:
+            raise ValueError(f"Cấu hình camera thiếu 'id' hoặc 'source': {camera}")
+        camera.setdefault('room', camera['id'])
+    return {camera['id']: camera for camera in cameras}
+
+
+def parse_source(source):
+    # '0', '1', ... là chỉ số thiết bị, còn lại là đường dẫn file hoặc URL
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+def is_video_file(source):
+    return isinstance(source, str) and '://' not in source
+
+
+class CameraSource:
+    # Bọc cv2.VideoCapture: file video được phát lại theo đúng tốc độ gốc
+    # (và lặp lại nếu loop=True) để dùng thay camera thật khi thử nghiệm
+    def __init__(self, source, loop=False):
+        self.source = parse_source(source)
+        self.capture = cv2.VideoCapture(self.source)
+        self.loop = loop
+        self.frame_interval = 0.0
+        if is_video_file(self.source):
+            fps = self.capture.get(cv2.CAP_PROP_FPS)
+            self.frame_interval = 1.0 / fps if fps and fps > 0 else 1.0 / 30
+        self._next_frame_time = time.monotonic()
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def read(self):
+        success, frame = self.capture.read()
+        if not success and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.capture.read()
+
+        if success and self.frame_interval:
+            # Giữ nhịp như camera thật thay vì đọc file nhanh nhất có thể
+            self._next_frame_time += self.frame_interval
+            delay = self._next_frame_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self._next_frame_time = time.monotonic()
+        return success, frame
+
+    def release(self):
+        self.capture.release()
+
+
+def open_camera(camera):
+    return CameraSource(camera['source'], loop=camera.get('loop', False))
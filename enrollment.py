@@ -0,0 +1,230 @@
+import argparse
+import base64
+import csv
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import zipfile
+
+import face_store
+import photo_store
+import recognition
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def check_student_fields(student_id, student_name):
+    if not student_id or not student_name:
+        return 'Thiếu mã sinh viên hoặc tên sinh viên'
+    return None
+
+
+def validate_student(students_collection, student_id, student_name):
+    # Trả về thông báo lỗi, hoặc None nếu hợp lệ
+    error = check_student_fields(student_id, student_name)
+    if error:
+        return error
+    # Kiểm tra xem mã sinh viên đã tồn tại chưa
+    if students_collection.find_one({'student_id': student_id}):
+        return 'Mã sinh viên đã tồn tại'
+    return None
+
+
+def decode_webcam_image(webcam_image):
+    # Ảnh từ webcam gửi lên dạng data URL base64
+    image_data = webcam_image.split(',')[1]
+    return base64.b64decode(image_data)
+
+
+def encode_image_file(file_path):
+    # Trả về (số khuôn mặt, encoding nếu có đúng một khuôn mặt); file_path có thể là file đã mở
+    import face_recognition
+
+    image = face_recognition.load_image_file(file_path)
+    face_locations = face_recognition.face_locations(image)
+    if len(face_locations) != 1:
+        return len(face_locations), None
+    return 1, face_recognition.face_encodings(image, face_locations)[0].tolist()
+
+
+def prepare_image(task):
+    # Chạy trong process pool: chuẩn hóa ảnh, tính encoding rồi lưu ảnh theo hash nội dung.
+    # Trả về (hash, tên file, số khuôn mặt, encoding); hash None nếu không đọc được ảnh.
+    # Sinh viên đã có (existing=True) chỉ cần hash để so với ảnh đã lưu, không encode/lưu
+    image_path, upload_folder, existing = task
+    try:
+        with open(image_path, 'rb') as f:
+            data = photo_store.normalize_image(f.read())
+    except (OSError, ValueError):
+        return None, None, 0, None
+    image_hash = photo_store.photo_hash(data)
+    if existing:
+        return image_hash, None, 0, None
+    face_count, encoding = encode_image_file(io.BytesIO(data))
+    if face_count != 1:
+        return image_hash, None, face_count, None
+    return image_hash, photo_store.write_photo(upload_folder, data), face_count, encoding
+
+
+def read_roster(roster_path):
+    # CSV gồm các cột student_id, name và (không bắt buộc) image; thiếu image thì
+    # tìm ảnh có tên file (bỏ phần mở rộng) trùng với mã sinh viên
+    with open(roster_path, encoding='utf-8-sig', newline='') as text:
+        return [
+            {key.strip(): (value or '').strip() for key, value in row.items() if key}
+            for row in csv.DictReader(text)
+        ]
+
+
+def extract_images(images_path, target_dir):
+    # Giải nén các ảnh trong file ZIP để worker đọc trực tiếp từ đĩa. Giữ cấu trúc thư mục để
+    # a/123.jpg và b/123.jpg không ghi đè nhau (bỏ '..' và '/' ở đầu để không ghi ra ngoài target_dir)
+    with zipfile.ZipFile(images_path) as archive:
+        for member in archive.infolist():
+            parts = [part for part in member.filename.replace('\\', '/').split('/') if part not in ('', '.', '..')]
+            if member.is_dir() or not parts or not parts[-1].lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            target_path = os.path.join(target_dir, *parts)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            with archive.open(member) as source, open(target_path, 'wb') as target:
+                shutil.copyfileobj(source, target)
+    return target_dir
+
+
+def index_images(images_dir):
+    # Tìm ảnh theo tên file hoặc tên không có đuôi (ở mọi thư mục con). Trả về thêm các tên ứng với
+    # nhiều ảnh khác nhau (vd. a/123.jpg và b/123.jpg, 123.jpg và 123.png): không đoán ảnh nào là đúng
+    images = {}
+    ambiguous = set()
+    for root, _, files in os.walk(images_dir):
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(root, name)
+                for key in (name, os.path.splitext(name)[0]):
+                    if key in images and images[key] != path:
+                        ambiguous.add(key)
+                    images.setdefault(key, path)
+    return images, ambiguous
+
+
+def bulk_enroll(students_collection, upload_folder, roster, images_path, pool=None, processes=None,
+                progress=None, batch_size=500):
+    # Nhập hàng loạt sinh viên từ CSV + thư mục/ZIP ảnh. Encoding chạy song song trên process pool,
+    # sinh viên hợp lệ được thêm bằng insert_many. Chạy lại sẽ bỏ qua ảnh đã được encode (theo hash ảnh đã chuẩn hóa).
+    report = {'total': 0, 'inserted': 0, 'skipped': 0,
+              'no_face': [], 'multiple_faces': [], 'errors': []}
+    with tempfile.TemporaryDirectory() as tmp:
+        if zipfile.is_zipfile(images_path):
+            images_path = extract_images(images_path, tmp)
+        images, ambiguous = index_images(images_path)
+
+        rows = read_roster(roster)
+        report['total'] = len(rows)
+        existing = {
+            student['student_id']: student.get(face_store.ENCODING_HASH_FIELD)
+            for student in students_collection.find(
+                {'student_id': {'$in': [row.get('student_id') for row in rows]}},
+                {'student_id': 1, face_store.ENCODING_HASH_FIELD: 1})
+        }
+
+        # Kiểm tra dữ liệu trước khi encode để không tốn công cho các dòng lỗi
+        tasks = []
+        seen = set()
+        for row in rows:
+            student_id, student_name = row.get('student_id'), row.get('name')
+            error = check_student_fields(student_id, student_name)
+            if error:
+                report['errors'].append(f'{student_id or "?"}: {error}')
+                continue
+            if student_id in seen:
+                report['errors'].append(f'{student_id}: trùng mã sinh viên trong file CSV')
+                continue
+            seen.add(student_id)
+            image_key = row.get('image') or student_id
+            if image_key in ambiguous:
+                report['errors'].append(f'{student_id}: có nhiều ảnh cùng tên {image_key}, không biết dùng ảnh nào')
+                continue
+            image_path = images.get(image_key)
+            if image_path is None:
+                report['errors'].append(f'{student_id}: không tìm thấy ảnh')
+                continue
+            tasks.append((student_id, student_name, image_path))
+
+        own_pool = None
+        if pool is None and processes != 0:
+            pool = own_pool = multiprocessing.Pool(processes, initializer=recognition.reset_signals)
+        try:
+            jobs = [(task[2], upload_folder, task[0] in existing) for task in tasks]
+            results = pool.imap(prepare_image, jobs, chunksize=4) if pool else map(prepare_image, jobs)
+
+            batch = []
+            for done, (task, result) in enumerate(zip(tasks, results), start=1):
+                student_id, student_name, _ = task
+                image_hash, filename, face_count, encoding = result
+                if image_hash is None:
+                    report['errors'].append(f'{student_id}: không đọc được ảnh')
+                elif student_id in existing:
+                    # Ảnh đã được encode ở lần chạy trước thì bỏ qua
+                    if existing[student_id] == image_hash:
+                        report['skipped'] += 1
+                    else:
+                        report['errors'].append(f'{student_id}: mã sinh viên đã tồn tại')
+                elif face_count == 0:
+                    report['no_face'].append(student_id)
+                elif face_count > 1:
+                    report['multiple_faces'].append(student_id)
+                else:
+                    batch.append({
+                        'student_id': student_id,
+                        'name': student_name,
+                        'image_path': filename,
+                        face_store.ENCODING_FIELD: encoding,
+                        face_store.ENCODING_PATH_FIELD: filename,
+                        face_store.ENCODING_HASH_FIELD: image_hash,
+                    })
+                if len(batch) >= batch_size:
+                    students_collection.insert_many(batch, ordered=False)
+                    report['inserted'] += len(batch)
+                    batch = []
+                if progress:
+                    progress(done, len(tasks))
+            if batch:
+                students_collection.insert_many(batch, ordered=False)
+                report['inserted'] += len(batch)
+        finally:
+            if own_pool is not None:
+                own_pool.close()
+                own_pool.join()
+    return report
+
+
+def print_report(report):
+    print(f"Tổng: {report['total']}, thêm mới: {report['inserted']}, bỏ qua (đã có): {report['skipped']}")
+    if report['no_face']:
+        print(f"Không tìm thấy khuôn mặt ({len(report['no_face'])}): {', '.join(report['no_face'])}")
+    if report['multiple_faces']:
+        print(f"Nhiều khuôn mặt ({len(report['multiple_faces'])}): {', '.join(report['multiple_faces'])}")
+    for error in report['errors']:
+        print(f"Lỗi: {error}")
+
+
+if __name__ == '__main__':
+    import database
+
+    parser = argparse.ArgumentParser(description='Nhập hàng loạt sinh viên từ file CSV và thư mục/ZIP ảnh')
+    parser.add_argument('roster', help='File CSV với các cột student_id, name, image (không bắt buộc)')
+    parser.add_argument('images', help='Thư mục ảnh hoặc file ZIP')
+    parser.add_argument('--mongodb-uri', default=database.mongodb_uri())
+    parser.add_argument('--upload-folder', default='static/student_images')
+    parser.add_argument('--processes', type=int, default=None, help='Số process encode (mặc định: số nhân CPU)')
+    args = parser.parse_args()
+
+    client = database.create_client(args.mongodb_uri)
+    students_collection = database.get_database(client)['students']
+    report = bulk_enroll(students_collection, args.upload_folder, args.roster, args.images,
+                         processes=args.processes,
+                         progress=lambda done, total: print(f"\rĐã encode {done}/{total}", end='', flush=True))
+    print()
+    print_report(report)
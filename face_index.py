@@ -0,0 +1,256 @@
+import copy
+import hashlib
+
+import numpy as np
+
+from atomic_file import atomic_write
+
+ENCODING_SIZE = 128
+# Chia nhỏ ma trận khi tính khoảng cách để không tốn quá nhiều bộ nhớ
+CHUNK_SIZE = 16384
+
+
+def _as_matrix(vectors):
+    return np.ascontiguousarray(np.asarray(vectors, dtype=np.float32).reshape(-1, ENCODING_SIZE))
+
+
+def _squared_norms(vectors):
+    return np.einsum('ij,ij->i', vectors, vectors)
+
+
+def _squared_distances(queries, vectors, vector_norms):
+    # ||a - b||^2 = ||a||^2 + ||b||^2 - 2 a.b, tính trong một phép nhân ma trận
+    squared = _squared_norms(queries)[:, None] + vector_norms[None, :] - 2.0 * queries @ vectors.T
+    return np.maximum(squared, 0.0)
+
+
+def _top_k(squared, k):
+    # Lấy k cột nhỏ nhất của từng hàng, sắp xếp tăng dần
+    k = min(k, squared.shape[1])
+    if k < squared.shape[1]:
+        columns = np.argpartition(squared, k - 1, axis=1)[:, :k]
+    else:
+        columns = np.tile(np.arange(squared.shape[1]), (squared.shape[0], 1))
+    rows = np.arange(squared.shape[0])[:, None]
+    order = np.argsort(squared[rows, columns], axis=1)
+    columns = columns[rows, order]
+    return np.sqrt(squared[rows, columns]), columns
+
+
+def _pad(distances, indices, k):
+    # Bổ sung (inf, -1) khi gallery có ít hơn k phần tử
+    missing = k - distances.shape[1]
+    if missing > 0:
+        distances = np.pad(distances, ((0, 0), (0, missing)), constant_values=np.inf)
+        indices = np.pad(indices, ((0, 0), (0, missing)), constant_values=-1)
+    return distances, indices
+
+
+def fingerprint(encodings):
+    # Dấu vân tay của dữ liệu để biết index lưu trên đĩa còn khớp hay không
+    return hashlib.sha1(_as_matrix(encodings).tobytes()).hexdigest()
+
+
+class BruteForceIndex:
+    kind = 'brute'
+
+    def __init__(self, encodings):
+        self.vectors = _as_matrix(encodings)
+        self.norms = _squared_norms(self.vectors)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def search(self, queries, k=1):
+        # Quét toàn bộ gallery, kết quả chính xác
+        queries = _as_matrix(queries)
+        if len(self) == 0:
+            return _pad(np.empty((len(queries), 0), np.float32), np.empty((len(queries), 0), np.int64), k)
+        return _pad(*_top_k(_squared_distances(queries, self.vectors, self.norms), k), k)
+
+    # Cập nhật từng phần tử theo kiểu copy-on-write: trả về index mới, index cũ giữ nguyên
+    # để các luồng đang đọc không bị ảnh hưởng
+    def added(self, vector):
+        return self._with_vectors(np.vstack([self.vectors, _as_matrix(vector)]))
+
+    def replaced(self, position, vector):
+        vectors = self.vectors.copy()
+        vectors[position] = _as_matrix(vector)[0]
+        return self._with_vectors(vectors)
+
+    def removed(self, position):
+        return self._with_vectors(np.delete(self.vectors, position, axis=0))
+
+    def _with_vectors(self, vectors):
+        index = copy.copy(self)
+        index.vectors = vectors
+        index.norms = _squared_norms(vectors)
+        return index
+
+    def _arrays(self):
+        return {'vectors': self.vectors}
+
+    @classmethod
+    def _from_arrays(cls, arrays, **params):
+        return cls(arrays['vectors'])
+
+    def save(self, path, **extra):
+        _save(path, kind=self.kind, **self._arrays(), **extra)
+
+
+def _kmeans(data, n_clusters, iterations=10, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _assign(data, centroids)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        # Cụm rỗng giữ nguyên tâm cũ
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+def _assign(data, centroids):
+    norms = _squared_norms(centroids)
+    assignment = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), CHUNK_SIZE):
+        chunk = data[start:start + CHUNK_SIZE]
+        assignment[start:start + CHUNK_SIZE] = np.argmin(_squared_distances(chunk, centroids, norms), axis=1)
+    return assignment
+
+
+class IVFIndex:
+    # Inverted file index: chia gallery thành n_lists cụm bằng k-means, khi tìm kiếm
+    # chỉ quét n_probe cụm gần nhất. Tăng n_probe để tăng recall, giảm để tăng tốc độ.
+    kind = 'ivf'
+
+    def __init__(self, encodings, n_lists=None, n_probe=4, train_size=None, seed=0, centroids=None):
+        vectors = _as_matrix(encodings)
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(len(vectors))))
+        n_lists = max(1, min(n_lists, len(vectors))) if len(vectors) else 1
+        self.n_probe = n_probe
+
+        if centroids is None:
+            if len(vectors) == 0:
+                centroids = np.zeros((1, ENCODING_SIZE), np.float32)
+            else:
+                # Huấn luyện k-means trên một mẫu con để khởi tạo nhanh với gallery lớn
+                train_size = train_size or 256 * n_lists
+                rng = np.random.default_rng(seed)
+                sample = vectors if len(vectors) <= train_size else vectors[rng.choice(len(vectors), train_size, replace=False)]
+                centroids = _kmeans(sample, n_lists, seed=seed)
+        self.centroids = _as_matrix(centroids)
+        self.centroid_norms = _squared_norms(self.centroids)
+
+        # Lưu các cụm liền nhau (dạng CSR): ids[offsets[c]:offsets[c + 1]] thuộc cụm c
+        assignment = _assign(vectors, self.centroids) if len(vectors) else np.empty(0, np.int64)
+        order = np.argsort(assignment, kind='stable')
+        self.ids = order.astype(np.int64)
+        self.vectors = vectors[order]
+        self.norms = _squared_norms(self.vectors)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=len(self.centroids)))])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, queries, k=1):
+        queries = _as_matrix(queries)
+        all_distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        all_indices = np.full((len(queries), k), -1, dtype=np.int64)
+        if len(self) == 0:
+            return all_distances, all_indices
+
+        n_probe = max(1, min(self.n_probe, len(self.centroids)))
+        to_centroids = _squared_distances(queries, self.centroids, self.centroid_norms)
+        probes = np.argpartition(to_centroids, n_probe - 1, axis=1)[:, :n_probe]
+
+        for row, lists in enumerate(probes):
+            candidates = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in lists])
+            if len(candidates) == 0:
+                continue
+            squared = _squared_distances(queries[row:row + 1], self.vectors[candidates], self.norms[candidates])
+            distances, columns = _top_k(squared, k)
+            found = distances.shape[1]
+            all_distances[row, :found] = distances[0]
+            all_indices[row, :found] = self.ids[candidates[columns[0]]]
+        return all_distances, all_indices
+
+    # Cập nhật từng phần tử theo kiểu copy-on-write, giữ nguyên các tâm cụm đã huấn luyện
+    def added(self, vector):
+        return self._inserted(len(self), vector)
+
+    def replaced(self, position, vector):
+        return self._deleted(self._location(position), renumber=False)._inserted(position, vector)
+
+    def removed(self, position):
+        return self._deleted(self._location(position), renumber=True)
+
+    def _location(self, position):
+        return int(np.flatnonzero(self.ids == position)[0])
+
+    def _inserted(self, position, vector):
+        vector = _as_matrix(vector)
+        cluster = int(_assign(vector, self.centroids)[0])
+        at = self.offsets[cluster + 1]
+        index = copy.copy(self)
+        index.ids = np.insert(self.ids, at, position)
+        index.vectors = np.insert(self.vectors, at, vector[0], axis=0)
+        index.norms = np.insert(self.norms, at, _squared_norms(vector)[0])
+        index.offsets = self.offsets.copy()
+        index.offsets[cluster + 1:] += 1
+        return index
+
+    def _deleted(self, at, renumber):
+        cluster = int(np.searchsorted(self.offsets, at, side='right')) - 1
+        index = copy.copy(self)
+        index.ids = np.delete(self.ids, at)
+        if renumber:
+            # Các phần tử phía sau lùi lên một vị trí, giống danh sách sinh viên trong matcher
+            index.ids[index.ids > self.ids[at]] -= 1
+        index.vectors = np.delete(self.vectors, at, axis=0)
+        index.norms = np.delete(self.norms, at)
+        index.offsets = self.offsets.copy()
+        index.offsets[cluster + 1:] -= 1
+        return index
+
+    def _arrays(self):
+        # Lưu lại vectors theo thứ tự gốc để dựng lại index y hệt khi nạp
+        vectors = np.empty_like(self.vectors)
+        vectors[self.ids] = self.vectors
+        return {'vectors': vectors, 'centroids': self.centroids}
+
+    @classmethod
+    def _from_arrays(cls, arrays, n_probe=4, **params):
+        return cls(arrays['vectors'], n_probe=n_probe, centroids=arrays['centroids'])
+
+    def save(self, path, **extra):
+        _save(path, kind=self.kind, **self._arrays(), **extra)
+
+
+INDEX_TYPES = {
+    BruteForceIndex.kind: BruteForceIndex,
+    IVFIndex.kind: IVFIndex,
+}
+
+
+def create_index(kind, encodings, **params):
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Loại index không hợp lệ: {kind} (hỗ trợ: {', '.join(INDEX_TYPES)})")
+    return INDEX_TYPES[kind](encodings, **params)
+
+
+def _save(path, **arrays):
+    # Ghi qua file handle để np.savez không tự thêm đuôi .npz (đường dẫn lưu và đọc phải trùng nhau)
+    with atomic_write(path) as f:
+        np.savez(f, **arrays)
+
+
+def load_index(path, **params):
+    with np.load(path) as data:
+        arrays = {name: data[name] for name in data.files}
+    index = INDEX_TYPES[str(arrays.pop('kind'))]._from_arrays(arrays, **params)
+    index.fingerprint = str(arrays['fingerprint']) if 'fingerprint' in arrays else None
+    return index
@@ -0,0 +1,146 @@
+import collections
+import threading
+
+import cv2
+import numpy as np
+
+# Mắt phải mở lại trên blink_ear + BLINK_MARGIN sau khi nhắm mới tính là chớp mắt (tránh nhiễu quanh ngưỡng)
+BLINK_MARGIN = 0.05
+# Kích thước chuẩn khi đo độ nét, để phương sai Laplacian không phụ thuộc kích thước khuôn mặt
+SHARPNESS_SIZE = 96
+
+
+def crop_gray(rgb_frame, location):
+    top, right, bottom, left = location
+    height, width = rgb_frame.shape[:2]
+    crop = rgb_frame[max(top, 0):min(bottom, height), max(left, 0):min(right, width)]
+    if crop.size == 0:
+        return None
+    return cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY)
+
+
+def measure(rgb_frame, location):
+    # Các chỉ số rẻ, không cần model: kích thước (pixel), độ sáng trung bình (0-255)
+    # và độ nét (phương sai Laplacian trên ảnh khuôn mặt đã đưa về SHARPNESS_SIZE)
+    top, right, bottom, left = location
+    scores = {'size': min(bottom - top, right - left)}
+    gray = crop_gray(rgb_frame, location)
+    if gray is None:
+        scores.update(brightness=0.0, sharpness=0.0)
+        return scores
+    scores['brightness'] = float(gray.mean())
+    normalized = cv2.resize(gray, (SHARPNESS_SIZE, SHARPNESS_SIZE), interpolation=cv2.INTER_AREA)
+    scores['sharpness'] = float(cv2.Laplacian(normalized, cv2.CV_64F).var())
+    return scores
+
+
+def eye_aspect_ratio(eye):
+    # EAR (Soukupová & Čech): mắt nhắm thì tỉ lệ chiều cao/chiều rộng giảm mạnh; cần 6 điểm của model 68 điểm
+    if len(eye) != 6:
+        return None
+    p = np.asarray(eye, dtype=np.float32)
+    width = np.linalg.norm(p[0] - p[3])
+    if width == 0:
+        return None
+    return float((np.linalg.norm(p[1] - p[5]) + np.linalg.norm(p[2] - p[4])) / (2.0 * width))
+
+
+def landmark_scores(landmarks):
+    # Hướng mặt từ landmark (model 'small' hoặc 'large' của face_recognition):
+    # yaw = độ lệch của mũi so với giữa hai mắt, chia cho khoảng cách hai mắt (0 = nhìn thẳng)
+    left_eye = np.mean(landmarks['left_eye'], axis=0)
+    right_eye = np.mean(landmarks['right_eye'], axis=0)
+    nose = np.mean(landmarks['nose_tip'], axis=0)
+    eye_distance = np.linalg.norm(right_eye - left_eye)
+    scores = {'yaw': float((nose[0] - (left_eye[0] + right_eye[0]) / 2) / eye_distance) if eye_distance else 0.0}
+    ears = [eye_aspect_ratio(landmarks['left_eye']), eye_aspect_ratio(landmarks['right_eye'])]
+    if None not in ears:
+        scores['ear'] = sum(ears) / 2
+    return scores
+
+
+class QualityGate:
+    # Ngưỡng chất lượng trước khi tính encoding; ngưỡng bằng 0 thì bỏ qua tiêu chí đó
+    def __init__(self, min_size=40, min_sharpness=30.0, min_brightness=40.0, max_brightness=220.0, max_yaw=0.35):
+        self.min_size = min_size
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.max_yaw = max_yaw
+
+    @property
+    def needs_landmarks(self):
+        return bool(self.max_yaw)
+
+    def check(self, scores):
+        # Trả về lý do loại (để đếm trong metrics), None nếu đạt
+        if self.min_size and scores['size'] < self.min_size:
+            return 'size'
+        if self.min_brightness and scores['brightness'] < self.min_brightness:
+            return 'dark'
+        if self.max_brightness and scores['brightness'] > self.max_brightness:
+            return 'bright'
+        if self.min_sharpness and scores['sharpness'] < self.min_sharpness:
+            return 'blur'
+        if self.max_yaw and 'yaw' in scores and abs(scores['yaw']) > self.max_yaw:
+            return 'pose'
+        return None
+
+
+class LivenessCheck:
+    # Kiểm tra người thật qua nhiều frame trước khi ghi điểm danh: đạt khi thấy chớp mắt
+    # (EAR xuống dưới blink_ear rồi mở lại) hoặc đầu xoay nhẹ (yaw thay đổi ít nhất min_motion) trong window giây.
+    # Ảnh in/màn hình đưa trước camera di chuyển như một khối cứng nên yaw gần như không đổi
+    def __init__(self, window=5.0, blink_ear=0.21, min_motion=0.06):
+        self.window = window
+        self.blink_ear = blink_ear
+        self.min_motion = min_motion
+        self._samples = {}  # track id -> deque[(thời điểm, ear, yaw)]
+        self._pending = {}  # track id -> sinh viên đang chờ xác nhận
+        self._lock = threading.Lock()
+
+    def observe(self, track_id, now, scores):
+        if 'yaw' not in scores:
+            return
+        with self._lock:
+            samples = self._samples.setdefault(track_id, collections.deque())
+            samples.append((now, scores.get('ear'), scores['yaw']))
+            while samples and now - samples[0][0] > self.window:
+                samples.popleft()
+
+    def is_live(self, track_id):
+        with self._lock:
+            samples = list(self._samples.get(track_id, ()))
+        # Chớp mắt: một mẫu mắt nhắm rồi tới một mẫu mắt mở lại sau đó (mắt mở dần thành nhắm thì không tính)
+        closed = False
+        for _, ear, _ in samples:
+            if ear is None:
+                continue
+            if ear < self.blink_ear:
+                closed = True
+            elif closed and ear >= self.blink_ear + BLINK_MARGIN:
+                return True
+        yaws = [yaw for _, _, yaw in samples]
+        return len(yaws) >= 2 and max(yaws) - min(yaws) >= self.min_motion
+
+    def wait(self, track_id, student):
+        with self._lock:
+            self._pending[track_id] = student
+
+    def is_pending(self, track_id):
+        with self._lock:
+            return track_id in self._pending
+
+    def take(self, track_id):
+        with self._lock:
+            self._samples.pop(track_id, None)
+            return self._pending.pop(track_id, None)
+
+    def prune(self, now):
+        # Bỏ các track đã mất dấu lâu hơn window giây
+        with self._lock:
+            for track_id in [track_id for track_id, samples in self._samples.items()
+                             if not samples or now - samples[-1][0] > self.window]:
+                del self._samples[track_id]
+            for track_id in [track_id for track_id in self._pending if track_id not in self._samples]:
+                del self._pending[track_id]
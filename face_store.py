@@ -0,0 +1,122 @@
+import argparse
+import hashlib
+import os
+
+import numpy as np
+
+# Các trường lưu encoding trong document của sinh viên
+ENCODING_FIELD = 'face_encoding'
+ENCODING_PATH_FIELD = 'encoding_image_path'
+ENCODING_HASH_FIELD = 'encoding_image_hash'
+
+
+def file_hash(file_path):
+    # Băm nội dung ảnh để biết ảnh có thay đổi hay không
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def compute_encoding(file_path):
+    # Import khi cần: face_recognition nạp model dlib lúc import (xem recognition.py)
+    import face_recognition
+
+    # Đọc ảnh và chuyển sang RGB (face_recognition yêu cầu RGB)
+    image = face_recognition.load_image_file(file_path)
+
+    # Tìm khuôn mặt trong ảnh, lấy encoding của khuôn mặt đầu tiên
+    face_locations = face_recognition.face_locations(image)
+    if len(face_locations) == 0:
+        return None
+    return face_recognition.face_encodings(image, face_locations)[0]
+
+
+def build_encoding_fields(upload_folder, image_path):
+    # Tính encoding một lần khi thêm/sửa sinh viên, kèm khóa (đường dẫn + hash ảnh)
+    file_path = os.path.join(upload_folder, image_path)
+    encoding = compute_encoding(file_path)
+    return {
+        ENCODING_FIELD: encoding.tolist() if encoding is not None else None,
+        ENCODING_PATH_FIELD: image_path,
+        ENCODING_HASH_FIELD: file_hash(file_path),
+    }
+
+
+def is_encoding_fresh(student, upload_folder):
+    # Encoding còn đúng nếu được tính từ chính ảnh hiện tại của sinh viên
+    if student.get(ENCODING_PATH_FIELD) != student.get('image_path'):
+        return False
+    file_path = os.path.join(upload_folder, student['image_path'])
+    if not os.path.exists(file_path):
+        return False
+    return student.get(ENCODING_HASH_FIELD) == file_hash(file_path)
+
+
+def to_known_face(student):
+    # Chuyển document sinh viên thành khuôn mặt đã biết, None nếu chưa có encoding đúng với ảnh
+    encoding = student.get(ENCODING_FIELD)
+    if encoding is None or student.get(ENCODING_PATH_FIELD) != student.get('image_path'):
+        return None
+    return {
+        'encoding': np.asarray(encoding, dtype=np.float64),
+        'name': student['name'],
+        'student_id': student['student_id']
+    }
+
+
+def load_encodings(students_collection):
+    # Chỉ đọc encoding đã lưu, không giải mã ảnh khi khởi động
+    known_faces = []
+    stale = 0
+    projection = {'student_id': 1, 'name': 1, 'image_path': 1,
+                  ENCODING_FIELD: 1, ENCODING_PATH_FIELD: 1}
+    for student in students_collection.find({}, projection):
+        known_face = to_known_face(student)
+        if known_face is None:
+            stale += 1
+            continue
+        known_faces.append(known_face)
+    if stale:
+        print(f"{stale} sinh viên chưa có encoding, chạy 'python face_store.py' để cập nhật")
+    return known_faces
+
+
+def rebuild_encodings(students_collection, upload_folder, force=False):
+    # Tính lại encoding cho các sinh viên cũ hoặc có ảnh đã thay đổi
+    updated = skipped = missing = no_face = 0
+    for student in students_collection.find():
+        file_path = os.path.join(upload_folder, student['image_path'])
+        if not os.path.exists(file_path):
+            missing += 1
+            continue
+        if not force and student.get(ENCODING_FIELD) is not None \
+                and is_encoding_fresh(student, upload_folder):
+            skipped += 1
+            continue
+
+        fields = build_encoding_fields(upload_folder, student['image_path'])
+        if fields[ENCODING_FIELD] is None:
+            no_face += 1
+            print(f"Không tìm thấy khuôn mặt: {student['student_id']} ({student['image_path']})")
+        students_collection.update_one({'_id': student['_id']}, {'$set': fields})
+        updated += 1
+
+    return {'updated': updated, 'skipped': skipped, 'missing': missing, 'no_face': no_face}
+
+
+if __name__ == '__main__':
+    import database
+
+    parser = argparse.ArgumentParser(description='Tính lại encoding khuôn mặt cho sinh viên đã có')
+    parser.add_argument('--mongodb-uri', default=database.mongodb_uri())
+    parser.add_argument('--upload-folder', default='static/student_images')
+    parser.add_argument('--force', action='store_true', help='Tính lại cả các encoding còn đúng')
+    args = parser.parse_args()
+
+    client = database.create_client(args.mongodb_uri)
+    students_collection = database.get_database(client)['students']
+    result = rebuild_encodings(students_collection, args.upload_folder, force=args.force)
+    print(f"Cập nhật: {result['updated']}, bỏ qua: {result['skipped']}, "
+          f"thiếu ảnh: {result['missing']}, không có khuôn mặt: {result['no_face']}")
@@ -0,0 +1,47 @@
+import threading
+
+import face_store
+
+
+class FaceGallery:
+    # Gallery dùng chung trong process: luồng nhận diện đọc snapshot (matcher bất biến),
+    # các route thêm/sửa/xóa sinh viên thay snapshot mới theo kiểu copy-on-write
+    def __init__(self, load_known_faces, create_matcher):
+        self._load_known_faces = load_known_faces
+        self._create_matcher = create_matcher
+        self._lock = threading.Lock()
+        self._matcher = None
+
+    def snapshot(self):
+        # Đọc tham chiếu là thao tác nguyên tử, không cần khóa khi gallery đã được nạp
+        matcher = self._matcher
+        if matcher is None:
+            with self._lock:
+                if self._matcher is None:
+                    self._matcher = self._create_matcher(self._load_known_faces())
+                matcher = self._matcher
+        return matcher
+
+    def upsert_student(self, student):
+        # Cập nhật theo document sinh viên trong database: thêm/thay encoding,
+        # hoặc bỏ khỏi gallery nếu ảnh mới không có khuôn mặt
+        known_face = face_store.to_known_face(student)
+        with self._lock:
+            # Chưa nạp thì bỏ qua, lần nạp đầu tiên sẽ đọc dữ liệu mới nhất từ database
+            if self._matcher is None:
+                return
+            if known_face is None:
+                self._matcher = self._matcher.without_student(student['student_id'])
+            else:
+                self._matcher = self._matcher.with_face(known_face)
+
+    def remove_student(self, student_id):
+        with self._lock:
+            if self._matcher is not None:
+                self._matcher = self._matcher.without_student(student_id)
+
+    def reload(self):
+        # Nạp lại toàn bộ từ database, chỉ dùng sau khi nhập hàng loạt sinh viên
+        with self._lock:
+            if self._matcher is not None:
+                self._matcher = self._create_matcher(self._load_known_faces())
@@ -0,0 +1,34 @@
+import os
+
+# Worker dạng thread: mỗi client /video_feed giữ một thread suốt thời gian xem,
+# các trang quản lý dùng các thread còn lại (STREAM_MAX_CLIENTS trong app.py nên nhỏ hơn WEB_THREADS)
+bind = os.environ.get('BIND', '0.0.0.0:5001')
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', '32'))
+
+# Chỉ chạy đúng 1 worker: gallery khuôn mặt, bulk_enroll_jobs, last_attendance và camera là trạng thái
+# trong bộ nhớ của process (worker khác sẽ không thấy sinh viên mới, tiến độ nhập hàng loạt, điểm danh
+# vừa ghi), camera USB cũng chỉ mở được từ một process. Tăng WEB_THREADS để phục vụ nhiều client hơn;
+# phần tính toán nặng đã chạy trên process pool nhận diện
+workers = 1
+
+# Không nạp app trước khi fork: luồng ghi điểm danh, pipeline camera và process pool phải được tạo
+# trong chính process worker
+preload_app = False
+
+# Luồng video không bao giờ kết thúc, timeout chỉ áp dụng cho heartbeat của worker
+timeout = int(os.environ.get('WEB_TIMEOUT', '60'))
+graceful_timeout = 10
+keepalive = 5
+
+
+def on_starting(server):
+    # Chặn cả trường hợp ghi đè bằng dòng lệnh (gunicorn -w N)
+    if server.cfg.workers != 1:
+        raise SystemExit(f"Ứng dụng chỉ hỗ trợ 1 worker (đang đặt {server.cfg.workers}), hãy tăng WEB_THREADS")
+
+
+def worker_exit(server, worker):
+    # Dừng camera, ghi nốt điểm danh còn trong hàng đợi rồi dừng process pool khi worker thoát
+    from app import shutdown
+    shutdown()
@@ -0,0 +1,91 @@
+import copy
+import os
+
+import numpy as np
+
+import face_index
+
+ENCODING_SIZE = face_index.ENCODING_SIZE
+
+
+class FaceMatcher:
+    def __init__(self, known_faces, tolerance=0.6, index_type='brute', index_path=None, **index_params):
+        self.tolerance = tolerance
+        # Thông tin sinh viên theo đúng thứ tự hàng trong ma trận encoding
+        self.known_faces = [
+            {'name': face['name'], 'student_id': face['student_id']}
+            for face in known_faces
+        ]
+        self.positions = {face['student_id']: i for i, face in enumerate(self.known_faces)}
+        # Gom tất cả encoding vào một ma trận float32 liên tục (N x 128)
+        if known_faces:
+            encodings = np.stack([face['encoding'] for face in known_faces])
+        else:
+            encodings = np.empty((0, ENCODING_SIZE))
+        encodings = np.ascontiguousarray(encodings, dtype=np.float32)
+        self.index = self._build_index(encodings, index_type, index_path, index_params)
+
+    @staticmethod
+    def _build_index(encodings, index_type, index_path, index_params):
+        if not index_path:
+            return face_index.create_index(index_type, encodings, **index_params)
+
+        # Dùng lại index đã lưu trên đĩa nếu được dựng từ đúng dữ liệu hiện tại
+        data_fingerprint = face_index.fingerprint(encodings)
+        if os.path.exists(index_path):
+            query_params = {'n_probe': index_params['n_probe']} if 'n_probe' in index_params else {}
+            index = face_index.load_index(index_path, **query_params)
+            if index.kind == index_type and index.fingerprint == data_fingerprint:
+                return index
+
+        index = face_index.create_index(index_type, encodings, **index_params)
+        index.save(index_path, fingerprint=data_fingerprint)
+        return index
+
+    def __len__(self):
+        return len(self.known_faces)
+
+    # Thêm/sửa/xóa một sinh viên: trả về matcher mới, matcher cũ không thay đổi
+    # nên các luồng đang nhận diện với bản cũ vẫn an toàn
+    def with_face(self, face):
+        info = {'name': face['name'], 'student_id': face['student_id']}
+        position = self.positions.get(face['student_id'])
+        matcher = copy.copy(self)
+        matcher.known_faces = list(self.known_faces)
+        if position is None:
+            matcher.index = self.index.added(face['encoding'])
+            matcher.known_faces.append(info)
+            matcher.positions = dict(self.positions)
+            matcher.positions[face['student_id']] = len(self.known_faces)
+        else:
+            matcher.index = self.index.replaced(position, face['encoding'])
+            matcher.known_faces[position] = info
+        return matcher
+
+    def without_student(self, student_id):
+        position = self.positions.get(student_id)
+        if position is None:
+            return self
+        matcher = copy.copy(self)
+        matcher.index = self.index.removed(position)
+        matcher.known_faces = self.known_faces[:position] + self.known_faces[position + 1:]
+        matcher.positions = {face['student_id']: i for i, face in enumerate(matcher.known_faces)}
+        return matcher
+
+    def match(self, face_encodings):
+        # Trả về (sinh viên gần nhất hoặc None, khoảng cách) cho từng khuôn mặt
+        if len(face_encodings) == 0:
+            return []
+        if len(self) == 0:
+            return [(None, None) for _ in face_encodings]
+
+        # Tìm người gần nhất cho tất cả khuôn mặt trong một lần gọi index
+        distances, indices = self.index.search(face_encodings, k=1)
+
+        results = []
+        for index, distance in zip(indices[:, 0], distances[:, 0]):
+            if index >= 0 and distance <= self.tolerance:
+                results.append((self.known_faces[index], float(distance)))
+            else:
+                results.append((None, float(distance)))
+        return results
@@ -0,0 +1,198 @@
+import bisect
+import collections
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Bucket (giây) mặc định cho các histogram thời gian xử lý
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = collections.defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] += amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Mỗi bộ nhãn: [số lần theo từng bucket (chưa cộng dồn), tổng, số lần]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, key)} {count}'
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        # Định dạng text của Prometheus (text/plain; version=0.0.4)
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'attendance_stage_seconds', 'Thời gian xử lý từng bước của luồng nhận diện', ['camera', 'stage']))
+FRAMES_CAPTURED = REGISTRY.register(Counter(
+    'attendance_frames_captured_total', 'Số frame đọc được từ camera', ['camera']))
+FRAMES_DROPPED = REGISTRY.register(Counter(
+    'attendance_frames_dropped_total', 'Số frame bị bỏ do bước sau xử lý không kịp', ['camera', 'queue']))
+FACES_DETECTED = REGISTRY.register(Counter(
+    'attendance_faces_detected_total', 'Số khuôn mặt phát hiện được', ['camera']))
+FACES_ENCODED = REGISTRY.register(Counter(
+    'attendance_faces_encoded_total', 'Số khuôn mặt phải tính encoding', ['camera']))
+FACES_RECOGNIZED = REGISTRY.register(Counter(
+    'attendance_faces_recognized_total', 'Số khuôn mặt khớp với sinh viên', ['camera']))
+FACES_UNKNOWN = REGISTRY.register(Counter(
+    'attendance_faces_unknown_total', 'Số khuôn mặt không khớp với sinh viên nào', ['camera']))
+FACES_SKIPPED = REGISTRY.register(Counter(
+    'attendance_faces_skipped_total', 'Số khuôn mặt bỏ qua encoding do chất lượng thấp', ['camera', 'reason']))
+ENCODE_SECONDS_SAVED = REGISTRY.register(Counter(
+    'attendance_encode_seconds_saved_total',
+    'Thời gian encoding ước tính đã tiết kiệm nhờ bỏ qua khuôn mặt chất lượng thấp', ['camera']))
+LIVENESS_PENDING = REGISTRY.register(Counter(
+    'attendance_liveness_pending_total', 'Số lần nhận ra sinh viên nhưng phải chờ kiểm tra người thật', ['camera']))
+STREAM_BYTES = REGISTRY.register(Counter(
+    'attendance_stream_bytes_total', 'Số byte JPEG đã gửi cho client /video_feed', ['camera', 'profile']))
+STREAM_FRAMES_SKIPPED = REGISTRY.register(Counter(
+    'attendance_stream_frames_skipped_total', 'Số frame client bỏ qua do giới hạn fps hoặc mạng chậm',
+    ['camera', 'profile']))
+RECOGNITION_ERRORS = REGISTRY.register(Counter(
+    'attendance_recognition_errors_total', 'Số frame nhận diện bị lỗi (luồng nhận diện vẫn chạy tiếp)', ['camera']))
+MONGO_SECONDS = REGISTRY.register(Histogram(
+    'attendance_mongo_seconds', 'Thời gian thực hiện thao tác MongoDB', ['operation']))
+ATTENDANCE_WRITTEN = REGISTRY.register(Counter(
+    'attendance_records_written_total', 'Số bản ghi điểm danh đã gửi xuống MongoDB', []))
+ATTENDANCE_WRITE_ERRORS = REGISTRY.register(Counter(
+    'attendance_write_errors_total', 'Số lỗi không mong đợi trong luồng ghi điểm danh', []))
+
+
+class SamplingProfiler:
+    # Profiler lấy mẫu: định kỳ chụp stack của mọi luồng trong process (sys._current_frames),
+    # gộp theo dạng "collapsed stack" để vẽ flame graph. Bật/tắt lúc đang chạy, mặc định tắt.
+    def __init__(self):
+        self.interval = 0.01
+        self.samples = collections.Counter()
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=0.01):
+        if self.running:
+            return
+        self.interval = interval
+        with self._lock:
+            self.samples = collections.Counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({code.co_filename}:{frame.f_lineno})')
+                    frame = frame.f_back
+                with self._lock:
+                    self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        with self._lock:
+            samples = self.samples.copy()
+        return ''.join(f'{stack} {count}\n' for stack, count in samples.most_common())
+
+
+PROFILER = SamplingProfiler()
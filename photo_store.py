@@ -0,0 +1,136 @@
+import argparse
+import hashlib
+import os
+
+import cv2
+import numpy as np
+
+import face_store
+from atomic_file import atomic_write
+
+# Ảnh sinh viên được chuẩn hóa về JPEG, cạnh dài tối đa PHOTO_MAX_SIZE (đủ cho encoding),
+# lưu theo hash nội dung: cùng một ảnh chỉ lưu một lần, hai ảnh khác nhau không bao giờ trùng tên
+PHOTO_MAX_SIZE = 1024
+PHOTO_JPEG_QUALITY = 90
+THUMBNAIL_SIZE = 160
+THUMBNAIL_JPEG_QUALITY = 80
+THUMBNAIL_DIR = 'thumbs'
+
+
+def fit_within(image, max_size):
+    height, width = image.shape[:2]
+    scale = max_size / max(height, width)
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def encode_jpeg(image, quality):
+    ret, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ret:
+        raise ValueError('Không mã hóa được ảnh')
+    return buffer.tobytes()
+
+
+def normalize_image(image_bytes, max_size=PHOTO_MAX_SIZE):
+    # Giải mã mọi định dạng OpenCV đọc được (jpg, png, webp, bmp...), xoay theo EXIF,
+    # thu nhỏ và mã hóa lại thành JPEG
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError('Không đọc được file ảnh')
+    return encode_jpeg(fit_within(image, max_size), PHOTO_JPEG_QUALITY)
+
+
+def photo_hash(data):
+    # Cùng cách băm với face_store.file_hash: hash ảnh đã lưu trùng với tên file
+    return hashlib.sha1(data).hexdigest()
+
+
+def thumbnail_path(filename):
+    return f'{THUMBNAIL_DIR}/{filename}'
+
+
+def _write_new(file_path, data):
+    # Cùng nội dung thì cùng tên file: đã có thì không ghi lại
+    if os.path.exists(file_path):
+        return
+    with atomic_write(file_path) as f:
+        f.write(data)
+
+
+def write_photo(upload_folder, data):
+    # data là JPEG đã chuẩn hóa; ảnh đã có thì không ghi lại. Trả về tên file (tương đối với upload_folder)
+    filename = f'{photo_hash(data)}.jpg'
+    _write_new(os.path.join(upload_folder, filename), data)
+    thumbnail_file = os.path.join(upload_folder, thumbnail_path(filename))
+    if not os.path.exists(thumbnail_file):
+        os.makedirs(os.path.dirname(thumbnail_file), exist_ok=True)
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        _write_new(thumbnail_file, encode_jpeg(fit_within(image, THUMBNAIL_SIZE), THUMBNAIL_JPEG_QUALITY))
+    return filename
+
+
+def save_photo(upload_folder, image_bytes):
+    return write_photo(upload_folder, normalize_image(image_bytes))
+
+
+def save_photo_file(upload_folder, file_path):
+    with open(file_path, 'rb') as f:
+        return save_photo(upload_folder, f.read())
+
+
+def delete_photo(upload_folder, filename):
+    # Chỉ gọi khi không còn sinh viên nào dùng ảnh (ảnh trùng nội dung được dùng chung)
+    for path in (filename, thumbnail_path(filename)):
+        file_path = os.path.join(upload_folder, path)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def thumbnail_or_original(upload_folder, filename):
+    # Ảnh cũ (trước khi có thumbnail) thì dùng ảnh gốc
+    if os.path.exists(os.path.join(upload_folder, thumbnail_path(filename))):
+        return thumbnail_path(filename)
+    return filename
+
+
+def migrate(students_collection, upload_folder):
+    # Chuyển ảnh cũ (tên theo file upload) sang dạng chuẩn hóa + thumbnail, tính lại encoding
+    migrated = 0
+    for student in students_collection.find({}, {'student_id': 1, 'image_path': 1}):
+        old_path = student.get('image_path')
+        old_file = os.path.join(upload_folder, old_path or '')
+        if not old_path or not os.path.isfile(old_file):
+            print(f"Không tìm thấy ảnh: {student['student_id']} ({old_path})")
+            continue
+        if old_path == f'{face_store.file_hash(old_file)}.jpg':
+            # Ảnh đã chuẩn hóa, chỉ tạo thumbnail nếu còn thiếu
+            with open(old_file, 'rb') as f:
+                write_photo(upload_folder, f.read())
+            continue
+        try:
+            filename = save_photo_file(upload_folder, old_file)
+        except ValueError as e:
+            print(f"{student['student_id']}: {str(e)}")
+            continue
+        update = {'image_path': filename}
+        update.update(face_store.build_encoding_fields(upload_folder, filename))
+        students_collection.update_one({'_id': student['_id']}, {'$set': update})
+        migrated += 1
+        if not students_collection.find_one({'image_path': old_path}, {'_id': 1}):
+            os.remove(old_file)
+    print(f"Đã chuẩn hóa ảnh của {migrated} sinh viên")
+    return migrated
+
+
+if __name__ == '__main__':
+    import database
+
+    parser = argparse.ArgumentParser(description='Chuẩn hóa ảnh sinh viên đã có và tạo thumbnail')
+    parser.add_argument('--mongodb-uri', default=database.mongodb_uri())
+    parser.add_argument('--upload-folder', default='static/student_images')
+    args = parser.parse_args()
+
+    client = database.create_client(args.mongodb_uri)
+    migrate(database.get_database(client)['students'], args.upload_folder)
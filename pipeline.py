@@ -0,0 +1,277 @@
+import queue
+import threading
+import time
+
+import cv2
+
+from metrics import (FRAMES_CAPTURED, FRAMES_DROPPED, RECOGNITION_ERRORS, STAGE_SECONDS, STREAM_BYTES,
+                     STREAM_FRAMES_SKIPPED)
+
+# Chiều ngang và chất lượng JPEG của luồng video được làm tròn về các mức cố định,
+# để số EncodedStream (và nhãn profile trong metrics) của mỗi camera luôn có giới hạn
+STREAM_WIDTHS = (160, 240, 320, 480, 640, 800, 960, 1280, 1920)
+STREAM_QUALITIES = (20, 30, 40, 50, 60, 70, 80, 90, 95)
+
+
+class LatestSlot:
+    # Hàng đợi 1 phần tử: phần tử mới ghi đè phần tử cũ chưa được lấy (bỏ frame cũ)
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._item = None
+        self._has_item = False
+
+    def put(self, item):
+        # Trả về True nếu phần tử cũ bị ghi đè
+        with self._condition:
+            replaced = self._has_item
+            self._item = item
+            self._has_item = True
+            self._condition.notify()
+            return replaced
+
+    def get(self, timeout=None):
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._has_item, timeout):
+                raise queue.Empty
+            item = self._item
+            self._item = None
+            self._has_item = False
+            return item
+
+
+def put_dropping_oldest(q, item):
+    # Hàng đợi có giới hạn: đầy thì bỏ phần tử cũ nhất để luồng trước không bị chặn.
+    # Trả về số phần tử đã bỏ
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+class FrameBroadcast:
+    # Bộ đệm phát: chỉ giữ frame mới nhất kèm số thứ tự, mọi client cùng đọc;
+    # client chậm sẽ bỏ qua các frame ở giữa thay vì làm chậm nguồn phát
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.sequence = 0
+        self.frame = None
+        self.closed = False
+
+    def publish(self, frame):
+        with self._condition:
+            self.sequence += 1
+            self.frame = frame
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    def wait(self, last_sequence, timeout=None):
+        with self._condition:
+            self._condition.wait_for(lambda: self.sequence > last_sequence or self.closed, timeout)
+            return self.sequence, self.frame
+
+
+def quantize_profile(max_width=0, quality=None):
+    # Chiều ngang làm tròn xuống mức gần nhất (không gửi ảnh lớn hơn client yêu cầu), 0 = giữ nguyên;
+    # chất lượng làm tròn về mức gần nhất, None = mặc định của OpenCV
+    if max_width:
+        max_width = max([width for width in STREAM_WIDTHS if width <= max_width] or [STREAM_WIDTHS[0]])
+    if quality:
+        quality = min(STREAM_QUALITIES, key=lambda level: abs(level - quality))
+    return max_width or 0, quality or None
+
+
+def resize_to_width(frame, max_width):
+    height, width = frame.shape[:2]
+    if not max_width or width <= max_width:
+        return frame
+    return cv2.resize(frame, (max_width, round(height * max_width / width)), interpolation=cv2.INTER_AREA)
+
+
+class EncodedStream:
+    # JPEG của một cấu hình (chiều ngang tối đa, chất lượng), dùng chung cho mọi client cùng cấu hình.
+    # Chỉ mã hóa khi có client cần frame, mỗi frame mã hóa tối đa một lần
+    def __init__(self, max_width=0, quality=None, name='default'):
+        self.max_width = max_width
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality] if quality else []
+        self.name = name
+        self.profile = f"{max_width or 'full'}/{quality or 'default'}"
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._jpeg = None
+
+    def encode(self, sequence, frame):
+        with self._lock:
+            # Đã có JPEG của frame này (hoặc mới hơn) thì dùng lại
+            if sequence > self._sequence:
+                with STAGE_SECONDS.time(camera=self.name, stage='jpeg_encode'):
+                    ret, buffer = cv2.imencode('.jpg', resize_to_width(frame, self.max_width), self.params)
+                if ret:
+                    self._sequence = sequence
+                    self._jpeg = buffer.tobytes()
+            return self._jpeg
+
+
+class RecognitionPipeline:
+    # capture -> (nhận diện trên frame mới nhất) -> vẽ khung -> mã hóa JPEG theo cấu hình của client -> client
+    # Nhận diện chạy song song trong các worker riêng nên luồng hiển thị không bị đứng;
+    # worker rảnh lúc nào thì lấy frame mới nhất lúc đó, tần suất nhận diện tự điều chỉnh theo tải
+    def __init__(self, camera, recognize, annotate, workers=1, queue_size=2, name='default'):
+        self.name = name  # Tên camera, dùng làm nhãn cho metrics
+        self.camera = camera
+        self.recognize = recognize
+        self.annotate = annotate
+        self.workers = workers
+
+        self.recognition_slot = LatestSlot()
+        self.display_queue = queue.Queue(maxsize=queue_size)
+        self.broadcast = FrameBroadcast()  # Frame đã vẽ khung, chưa mã hóa
+        self._streams = {}
+        self._streams_lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        targets = [self._capture_loop, self._annotate_loop]
+        targets += [self._recognition_loop] * self.workers
+        for target in targets:
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    @property
+    def running(self):
+        return not self._stop.is_set()
+
+    def stop(self):
+        self._stop.set()
+        self.broadcast.close()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+
+    def _capture_loop(self):
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                success, frame = self.camera.read()
+                if not success:
+                    break
+                STAGE_SECONDS.observe(time.perf_counter() - start, camera=self.name, stage='capture')
+                FRAMES_CAPTURED.inc(camera=self.name)
+                # Worker nhận diện luôn chỉ thấy frame mới nhất; frame hiển thị đi qua hàng đợi riêng
+                captured_at = time.monotonic()
+                if self.recognition_slot.put((frame, captured_at)):
+                    FRAMES_DROPPED.inc(camera=self.name, queue='recognition')
+                dropped = put_dropping_oldest(self.display_queue, (frame, captured_at))
+                if dropped:
+                    FRAMES_DROPPED.inc(dropped, camera=self.name, queue='display')
+        finally:
+            # Pipeline sở hữu camera: đóng camera khi dừng để lần sau mở lại được
+            self.camera.release()
+            self._stop.set()
+            self.broadcast.close()
+
+    def _recognition_loop(self):
+        while not self._stop.is_set():
+            try:
+                frame, captured_at = self.recognition_slot.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self.recognize(frame, captured_at)
+            except Exception as e:
+                # Một frame lỗi không được làm chết worker: ghi log, đếm lỗi và lấy frame tiếp theo
+                print(f"Lỗi nhận diện ({self.name}): {e!r}")
+                RECOGNITION_ERRORS.inc(camera=self.name)
+
+    def _annotate_loop(self):
+        while not self._stop.is_set():
+            try:
+                frame, captured_at = self.display_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # Vẽ khung theo trạng thái mà recognize cập nhật (vd. tracker dùng chung), frame gốc vẫn được worker dùng
+            frame = frame.copy()
+            with STAGE_SECONDS.time(camera=self.name, stage='annotate'):
+                self.annotate(frame, captured_at)
+            self.broadcast.publish(frame)
+
+    def stream(self, max_width=0, quality=None):
+        key = max_width, quality = quantize_profile(max_width, quality)
+        with self._streams_lock:
+            if key not in self._streams:
+                self._streams[key] = EncodedStream(max_width, quality, self.name)
+            return self._streams[key]
+
+    def frames(self, fps=0, max_width=0, quality=None):
+        # Sinh các JPEG đã mã hóa cho tới khi camera dừng. Client chỉ lấy frame mới nhất khi
+        # đã gửi xong frame trước (socket chậm thì bỏ qua các frame ở giữa) và không quá fps frame/giây;
+        # nhận diện không bị ảnh hưởng vì chạy trên frame gốc ở luồng riêng
+        stream = self.stream(max_width, quality)
+        min_interval = 1.0 / fps if fps else 0.0
+        last_sequence = 0
+        while True:
+            sequence, frame = self.broadcast.wait(last_sequence, timeout=0.5)
+            if sequence <= last_sequence:
+                if self.broadcast.closed:
+                    return
+                continue
+            if last_sequence and sequence - last_sequence > 1:
+                STREAM_FRAMES_SKIPPED.inc(sequence - last_sequence - 1, camera=self.name, profile=stream.profile)
+            last_sequence = sequence
+            sent_at = time.monotonic()
+            jpeg = stream.encode(sequence, frame)
+            if jpeg is None:
+                continue
+            STREAM_BYTES.inc(len(jpeg), camera=self.name, profile=stream.profile)
+            yield jpeg
+            if min_interval:
+                delay = sent_at + min_interval - time.monotonic()
+                if delay > 0 and self._stop.wait(delay):
+                    return
+
+
+class SharedPipeline:
+    # Một pipeline duy nhất cho mỗi camera dùng chung cho mọi client /video_feed:
+    # đọc camera, nhận diện và mã hóa JPEG chỉ chạy một lần dù có bao nhiêu người xem.
+    # Pipeline được khởi động khi có client đầu tiên và dừng khi client cuối cùng rời đi.
+    def __init__(self, create_pipeline):
+        self._create_pipeline = create_pipeline
+        self._lock = threading.Lock()
+        self._pipeline = None
+        self.subscribers = 0
+
+    def frames(self, **profile):
+        with self._lock:
+            if self._pipeline is None or not self._pipeline.running:
+                self._pipeline = self._create_pipeline().start()
+            pipeline = self._pipeline
+            self.subscribers += 1
+        try:
+            yield from pipeline.frames(**profile)
+        finally:
+            with self._lock:
+                self.subscribers -= 1
+                if self.subscribers == 0 and self._pipeline is pipeline:
+                    pipeline.stop()
+                    self._pipeline = None
+
+    def stop(self):
+        # Dừng pipeline khi tắt server; client còn lại sẽ nhận hết frame và kết thúc
+        with self._lock:
+            if self._pipeline is not None:
+                self._pipeline.stop()
+                self._pipeline = None
@@ -0,0 +1,82 @@
+import signal
+import time
+
+import cv2
+
+import face_quality
+
+# Các hàm chạy trong process pool: chỉ phụ thuộc OpenCV và face_recognition,
+# không đụng tới Flask hay MongoDB.
+# face_recognition nạp các model dlib ngay khi import (mất vài giây), nên chỉ import khi thật sự
+# cần phát hiện/encoding; process chỉ phục vụ trang quản lý không bao giờ phải nạp
+
+
+def reset_signals():
+    # Process con được fork từ worker gunicorn thừa hưởng handler SIGTERM của gunicorn (chỉ đặt cờ, không thoát),
+    # khiến Pool.terminate() chờ mãi: trả SIGTERM/SIGINT về mặc định để process con thoát ngay
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+
+def load_models():
+    # Dùng làm initializer của process pool để nạp model ngay khi pool được tạo
+    reset_signals()
+    import face_recognition
+
+
+def to_rgb(frame):
+    # Chuyển sang RGB cho face_recognition
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+def detect(rgb_frame, detect_width=0, model='hog', upsample=1):
+    # Tìm khuôn mặt trên ảnh thu nhỏ còn detect_width pixel chiều ngang (0 = giữ nguyên),
+    # rồi phóng tọa độ về kích thước gốc để encoding và vẽ khung
+    import face_recognition
+
+    height, width = rgb_frame.shape[:2]
+    if not detect_width or detect_width >= width:
+        return face_recognition.face_locations(rgb_frame, number_of_times_to_upsample=upsample, model=model)
+
+    scale = width / detect_width
+    small_frame = cv2.resize(rgb_frame, (detect_width, int(round(height / scale))), interpolation=cv2.INTER_AREA)
+    face_locations = face_recognition.face_locations(small_frame, number_of_times_to_upsample=upsample, model=model)
+    return [
+        (max(int(top * scale), 0), min(int(right * scale), width - 1),
+         min(int(bottom * scale), height - 1), max(int(left * scale), 0))
+        for top, right, bottom, left in face_locations
+    ]
+
+
+def encode(rgb_frame, face_locations):
+    # Tính encoding cho từng khuôn mặt đã tìm thấy
+    import face_recognition
+
+    return face_recognition.face_encodings(rgb_frame, face_locations)
+
+
+def analyze(rgb_frame, face_locations, encode_mask, gate=None, landmark_model=None):
+    # Chấm chất lượng từng khuôn mặt, chỉ tính encoding cho khuôn mặt cần encode (encode_mask) và đạt ngưỡng.
+    # Landmark (cho hướng mặt/chớp mắt) chỉ tính cho khuôn mặt đã qua các tiêu chí rẻ (kích thước, độ sáng, độ nét).
+    # Trả về (điểm, lý do bị loại hoặc None, encoding hoặc None, thời gian encoding) theo từng khuôn mặt
+    import face_recognition
+
+    scores = [face_quality.measure(rgb_frame, location) for location in face_locations]
+    rejected = [gate.check(score) if gate else None for score in scores]
+    indices = [i for i, reason in enumerate(rejected) if reason is None]
+    if landmark_model and indices:
+        landmarks = face_recognition.face_landmarks(rgb_frame, [face_locations[i] for i in indices],
+                                                    model=landmark_model)
+        for i, points in zip(indices, landmarks):
+            scores[i].update(face_quality.landmark_scores(points))
+            if gate:
+                rejected[i] = gate.check(scores[i])
+
+    indices = [i for i, reason in enumerate(rejected) if reason is None and encode_mask[i]]
+    encodings = [None] * len(face_locations)
+    start = time.perf_counter()
+    if indices:
+        for i, encoding in zip(indices, encode(rgb_frame, [face_locations[i] for i in indices])):
+            encodings[i] = encoding
+    return scores, rejected, encodings, time.perf_counter() - start
+
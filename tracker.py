@@ -0,0 +1,106 @@
+import itertools
+import threading
+
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    # IoU giữa từng cặp khung (top, right, bottom, left)
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    top = np.maximum(a[:, None, 0], b[None, :, 0])
+    right = np.minimum(a[:, None, 1], b[None, :, 1])
+    bottom = np.minimum(a[:, None, 2], b[None, :, 2])
+    left = np.maximum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+    area_a = (a[:, 1] - a[:, 3]) * (a[:, 2] - a[:, 0])
+    area_b = (b[:, 1] - b[:, 3]) * (b[:, 2] - b[:, 0])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-6), 0.0)
+
+
+class Track:
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.velocity = np.zeros(4, dtype=np.float32)  # pixel/giây cho từng cạnh của khung
+        self.updated_at = now
+        self.label = None  # Tên hiển thị sau khi đã nhận diện
+        self.known = False  # Đã khớp với một sinh viên hay chưa
+        self.confirmed_at = None  # Thời điểm tính encoding gần nhất
+
+    def predict(self, now, max_extrapolation):
+        # Dự đoán vị trí khung ở thời điểm now theo vận tốc, để khung bám theo khuôn mặt ở mọi frame
+        dt = min(max(now - self.updated_at, 0.0), max_extrapolation)
+        return tuple(int(round(v)) for v in self.box + self.velocity * dt)
+
+
+class FaceTracker:
+    # Theo dõi khuôn mặt giữa các lần nhận diện bằng cách ghép khung theo IoU:
+    # khuôn mặt đã nhận ra chỉ được tính lại encoding sau confirm_interval giây
+    def __init__(self, iou_threshold=0.3, max_age=2.0, confirm_interval=10.0, max_extrapolation=0.5):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.confirm_interval = confirm_interval
+        self.max_extrapolation = max_extrapolation
+        self.tracks = []
+        self.updated_at = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def update(self, boxes, now):
+        # Ghép các khung vừa phát hiện với các track hiện có, trả về track ứng với từng khung
+        # (None nếu kết quả thuộc frame cũ hơn lần cập nhật trước, do nhiều worker chạy song song)
+        with self._lock:
+            if self.updated_at is not None and now < self.updated_at:
+                return None
+            self.updated_at = now
+            self.tracks = [track for track in self.tracks if now - track.updated_at <= self.max_age]
+
+            matched = [None] * len(boxes)
+            if boxes and self.tracks:
+                overlaps = iou_matrix(boxes, [track.predict(now, self.max_extrapolation) for track in self.tracks])
+                used_tracks = set()
+                # Ghép tham lam theo IoU giảm dần
+                for flat in np.argsort(overlaps, axis=None)[::-1]:
+                    box_index, track_index = np.unravel_index(flat, overlaps.shape)
+                    if overlaps[box_index, track_index] < self.iou_threshold:
+                        break
+                    if matched[box_index] is not None or track_index in used_tracks:
+                        continue
+                    matched[box_index] = self.tracks[track_index]
+                    used_tracks.add(track_index)
+
+            for i, box in enumerate(boxes):
+                track = matched[i]
+                if track is None:
+                    track = Track(next(self._ids), box, now)
+                    self.tracks.append(track)
+                    matched[i] = track
+                    continue
+                box = np.asarray(box, dtype=np.float32)
+                dt = now - track.updated_at
+                if dt > 0:
+                    track.velocity = 0.5 * track.velocity + 0.5 * (box - track.box) / dt
+                track.box = box
+                track.updated_at = now
+            return matched
+
+    def needs_encoding(self, track, now):
+        # Track mới, chưa nhận ra ai, hoặc đã lâu chưa xác nhận lại thì mới cần tính encoding
+        return not track.known or track.confirmed_at is None or now - track.confirmed_at > self.confirm_interval
+
+    def confirm(self, track, label, known, now):
+        with self._lock:
+            track.label = label
+            track.known = known
+            track.confirmed_at = now
+
+    def positions(self, now):
+        # Khung (đã dự đoán theo thời điểm của frame) và tên của các track đang hoạt động
+        with self._lock:
+            return [
+                (track.predict(now, self.max_extrapolation), track.label)
+                for track in self.tracks
+                if track.label is not None and now - track.updated_at <= self.max_age
+            ]
@@ -0,0 +1,7 @@
+# Điểm vào cho server WSGI khi chạy thật, ví dụ:
+#   gunicorn -c gunicorn.conf.py wsgi:app
+# Mỗi process worker nạp app một lần: kết nối MongoDB, gallery, camera và process pool nhận diện
+# là singleton của process đó (camera chỉ được mở khi có client xem video đầu tiên)
+from app import app
+
+application = app